@@ -1,29 +1,74 @@
-import requests
 import csv
 import time
-import json
 import re
+import orjson
 import os
 from datetime import date
 from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
+import urllib3
+from urllib3.util.retry import Retry
 from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import httpx
+from collections import deque
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from zoneinfo import ZoneInfo  # Only in Python 3.9+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 
 BASE_URL = "https://letterboxd.com"
 HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36"
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36",
+    # Only ask for brotli when it can be decoded, otherwise we'd parse compressed bytes
+    "Accept-Encoding": "br, gzip, deflate" if brotli else "gzip, deflate",
 }
 MAX_FILMS = 1000
 MAX_PAGES = 14  # Hard limit: never scrape more than 14 pages
+CSV_COLUMNS = [
+    "Order", "Film ID", "Film URL", "Film Title", "Rating Count", "Rating Value",
+    "Genres", "Runtime", "TMDB Type", "Has Description", "Poster URL", "Snapshot Date"
+]
+CSV_WRITE_BUFFER = 1 << 20  # 1 MiB
+CSV_TAIL_BLOCK = 1 << 18  # bytes read per step when scanning the CSV backwards
+CHECKPOINT_ROWS = 100  # scraped rows buffered in memory before appending to the CSV
+DETAIL_WORKERS_START = 8  # initial number of film pages fetched concurrently
+DETAIL_WORKERS_MAX = 32
+THROTTLE_STATUSES = {429, 503}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DETAIL_RETRIES = 3
+MAX_RETRY_AFTER = 60  # seconds; cap on how long a Retry-After header can stall a film
+THROTTLE_RATE_LIMIT = 0.05  # halve concurrency when more of a batch than this is throttled
+STEADY_BATCHES_TO_GROW = 3  # clean batches needed before adding workers
+REQUEST_TIMEOUT = 10  # seconds
+PAGE_FETCH_WORKERS = 4
+PAGE_FETCH_DELAY = 0.25  # seconds each page worker waits after a request
+
+# Patterns used on every film page
+_RUNTIME_RE = re.compile(r"(\d+)\s*mins")
+_TMDB_PATH_RE = re.compile(r"themoviedb\.org/([^/]+)/\d+")
+_CDATA_RE = re.compile(rb"/\* <!\[CDATA\[ \*/|/\* \]\]> \*/")
+
+# Listing pages are plain GETs, so they go straight to a urllib3 pool
+HTTP = urllib3.PoolManager(
+    num_pools=4,
+    maxsize=PAGE_FETCH_WORKERS,
+    headers=HEADERS,
+    timeout=REQUEST_TIMEOUT,
+    retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                  raise_on_status=False),
+)
 
 
 def get_film_links_from_html(html_content):
     """Extract film links and IDs from the given HTML."""
-    soup = BeautifulSoup(html_content, "html.parser")
+    soup = BeautifulSoup(html_content, "lxml")
     film_items = soup.select("li.posteritem")
 
     films = []
@@ -38,6 +83,15 @@ def get_film_links_from_html(html_content):
     return films
 
 
+def fetch_listing_page(base_genre_url, page):
+    """Fetch a single listing page. Returns (page, status_code, content)."""
+    ajax_url = f"{base_genre_url}page/{page}/"
+    response = HTTP.request("GET", ajax_url)
+    # Per-worker delay keeps the request rate polite without serializing the crawl
+    time.sleep(PAGE_FETCH_DELAY)
+    return page, response.status, response.data
+
+
 def scrape_ajax_pages_single_pass(base_genre_url, pages):
     """Scrape all pages in a single pass, returning films with their page numbers.
     Returns a dict mapping film_id -> (film_url, earliest_page_number, position_in_page).
@@ -45,15 +99,18 @@ def scrape_ajax_pages_single_pass(base_genre_url, pages):
     # Enforce hard limit of 14 pages
     pages = min(pages, MAX_PAGES)
     film_data = {}  # film_id -> (film_url, min_page, position)
-    
-    for page in range(1, pages + 1):
+
+    # Pages are independent, so fetch them concurrently and process them in order
+    with ThreadPoolExecutor(max_workers=PAGE_FETCH_WORKERS) as executor:
+        results = list(executor.map(lambda page: fetch_listing_page(base_genre_url, page),
+                                     range(1, pages + 1)))
+
+    for page, status_code, content in results:
         print(f'  Scraping page {page}')
-        ajax_url = f"{base_genre_url}page/{page}/"
-        response = requests.get(ajax_url, headers=HEADERS)
-        if response.status_code != 200:
-            print(f"  Failed to fetch page {page}: {response.status_code}")
+        if status_code != 200:
+            print(f"  Failed to fetch page {page}: {status_code}")
             break
-        films_on_page = get_film_links_from_html(response.text)
+        films_on_page = get_film_links_from_html(content)
         if not films_on_page:
             print(f"  No films found on page {page}.")
             break
@@ -68,208 +125,314 @@ def scrape_ajax_pages_single_pass(base_genre_url, pages):
                 existing_url, existing_page, existing_pos = film_data[film_id]
                 if page < existing_page:
                     film_data[film_id] = (film_url, page, position)
-        
-        time.sleep(2)
-    
-    return film_data
 
+    return film_data
 
-def scrape_top_films(base_genre_url, pages=14, num_passes=2):
-    """Scrape pages multiple times and compare to identify the top 1000 films.
-    Films that appear consistently in early pages across passes are prioritized.
-    Returns list of (film_id, film_url) tuples ordered by their position.
-    Never exceeds MAX_PAGES pages."""
-    # Enforce hard limit of 14 pages
-    pages = min(pages, MAX_PAGES)
-    print(f"Starting {num_passes} passes to identify top {MAX_FILMS} films (max {pages} pages per pass)...")
-    
-    all_passes_data = []
-    
-    for pass_num in range(1, num_passes + 1):
-        print(f"\nPass {pass_num}/{num_passes}:")
-        pass_data = scrape_ajax_pages_single_pass(base_genre_url, pages)
-        all_passes_data.append(pass_data)
-        print(f"  Pass {pass_num} complete: found {len(pass_data)} unique films")
-        
-        if pass_num < num_passes:
-            # Wait a bit between passes to allow rankings to stabilize
-            print("  Waiting 5 seconds before next pass...")
-            time.sleep(5)
-    
-    # Combine data from all passes
-    # For each film, track: earliest page seen, latest page seen, number of passes it appeared in
-    film_scores = {}  # film_id -> (earliest_page, latest_page, num_passes, film_url)
-    
-    for pass_data in all_passes_data:
-        for film_id, (film_url, page, position) in pass_data.items():
-            if film_id not in film_scores:
-                film_scores[film_id] = {
-                    'earliest_page': page,
-                    'latest_page': page,
-                    'num_passes': 1,
-                    'film_url': film_url,
-                    'total_positions': [page]  # track all pages it appeared on
-                }
-            else:
-                score = film_scores[film_id]
-                score['earliest_page'] = min(score['earliest_page'], page)
-                score['latest_page'] = max(score['latest_page'], page)
-                score['num_passes'] += 1
-                score['total_positions'].append(page)
-    
-    # Calculate average page position for each film
-    for film_id, score in film_scores.items():
-        score['avg_page'] = sum(score['total_positions']) / len(score['total_positions'])
-    
-    # Sort films by:
-    # 1. Earliest page they appeared on (primary)
-    # 2. Average page position (secondary)
-    # 3. Number of passes they appeared in (tertiary - prefer films seen in all passes)
-    
-    sorted_films = sorted(
-        film_scores.items(),
-        key=lambda x: (
-            x[1]['earliest_page'],
-            x[1]['avg_page'],
-            -x[1]['num_passes']  # negative because more passes = better
-        )
-    )
-    
-    # Take top MAX_FILMS
-    top_films = sorted_films[:MAX_FILMS]
-    
-    print(f"\nIdentified top {len(top_films)} films:")
-    print(f"  Films appearing in all {num_passes} passes: {sum(1 for _, s in top_films if s['num_passes'] == num_passes)}")
-    print(f"  Films appearing in {num_passes-1} passes: {sum(1 for _, s in top_films if s['num_passes'] == num_passes-1)}")
-    
-    # Return as list of (film_id, film_url) tuples
-    return [(film_id, score['film_url']) for film_id, score in top_films]
-
-
-def get_film_details(film_url):
-    """Scrape a film page for details, including film title."""
-    response = requests.get(film_url, headers=HEADERS)
-    if response.status_code != 200:
-        print(f"Failed to fetch {film_url}: {response.status_code}")
-        return None
 
-    soup = BeautifulSoup(response.text, "html.parser")
+def parse_film_details(html_content):
+    """Extract film details from the HTML of a film page."""
+    tree = LexborHTMLParser(html_content)
 
     # Extract film title
-    title_tag = soup.select_one("h1.headline-1.primaryname > span.name.js-widont.prettify")
-    film_title = title_tag.text.strip() if title_tag else None
+    title_tag = tree.css_first("h1.headline-1.primaryname > span.name.js-widont.prettify")
+    film_title = title_tag.text().strip() if title_tag else None
 
     # Extract ratings
-    script_tag = soup.select_one("script[type='application/ld+json']")
+    script_tag = tree.css_first("script[type='application/ld+json']")
     rating_count, rating_value, poster_url = None, None, None
-    if script_tag and script_tag.string:
+    if script_tag and script_tag.text():
         try:
-            json_text = script_tag.string.strip()
-            json_text = json_text.replace("/* <![CDATA[ */", "").replace("/* ]]> */", "")
-            json_data = json.loads(json_text)
+            json_data = orjson.loads(_CDATA_RE.sub(b"", script_tag.text().encode()))
             rating_data = json_data.get("aggregateRating", {})
             rating_count = rating_data.get("ratingCount")
             rating_value = rating_data.get("ratingValue")
             poster_url = json_data.get("image")
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             pass
 
     # Genres
-    genre_section = soup.select_one("div#tab-genres .text-sluglist p")
-    genres = [a.text for a in genre_section.find_all("a")] if genre_section else []
+    genre_section = tree.css_first("div#tab-genres .text-sluglist p")
+    genres = [a.text() for a in genre_section.css("a")] if genre_section else []
 
     # Runtime and TMDB type
     runtime, tmdb_type = None, None
-    runtime_section = soup.select_one("p.text-link.text-footer")
+    runtime_section = tree.css_first("p.text-link.text-footer")
     if runtime_section:
-        match = re.search(r"(\d+)\s*mins", runtime_section.text)
+        match = _RUNTIME_RE.search(runtime_section.text())
         if match:
             runtime = match.group(1)
-        tmdb_link = runtime_section.find("a", href=re.compile(r"https://www.themoviedb.org/"))
+        tmdb_link = runtime_section.css_first("a[href^='https://www.themoviedb.org/']")
         if tmdb_link:
-            match = re.search(r"themoviedb\.org/([^/]+)/\d+", tmdb_link["href"])
+            match = _TMDB_PATH_RE.search(tmdb_link.attributes.get("href") or "")
             if match:
                 tmdb_type = match.group(1)
 
     # Has description
     has_description = bool(
-        soup.find('meta', attrs={'name': 'description'}) or
-        soup.find('meta', attrs={'property': 'og:description'})
+        tree.css_first("meta[name='description']") or
+        tree.css_first("meta[property='og:description']")
     )
 
     return film_title, rating_count, rating_value, genres, runtime, tmdb_type, has_description, poster_url
 
 
-def save_to_csv(data, filename):
-    """Append data to the main CSV file, ensuring no duplicate Film IDs per snapshot date."""
-    new_df = pd.DataFrame(data, columns=[
-        "Order", "Film ID", "Film URL", "Film Title", "Rating Count", "Rating Value",
-        "Genres", "Runtime", "TMDB Type", "Has Description", "Poster URL", "Snapshot Date"
-    ])
-    
-    # Deduplicate within the new data by keeping first occurrence of each Film ID per snapshot date
-    new_df = new_df.drop_duplicates(subset=['Film ID', 'Snapshot Date'], keep='first')
-    print(f"New data: {len(data)} rows -> {len(new_df)} unique rows after deduplication")
-
-    if os.path.exists(filename):
-        existing_df = pd.read_csv(filename)
-        # Also deduplicate existing data to clean up any historical duplicates
-        existing_df = existing_df.drop_duplicates(subset=['Film ID', 'Snapshot Date'], keep='first')
-        combined_df = pd.concat([existing_df, new_df], ignore_index=True)
+def retry_delay(response, attempt):
+    """Seconds to wait before retry number attempt + 1: exponential backoff, stretched to
+    honour a throttled response's Retry-After (seconds or HTTP date, capped)."""
+    delay = 0.5 * 2 ** attempt
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and response.status_code in THROTTLE_STATUSES:
+        try:
+            seconds = float(retry_after)
+        except ValueError:
+            try:
+                seconds = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                seconds = 0
+        delay = max(delay, min(seconds, MAX_RETRY_AFTER))
+    return delay
+
+
+async def fetch_film_details(client, film_url):
+    """Fetch and parse a film page.
+    Returns (status_code, elapsed_seconds, details, attempts, throttled_attempts), where
+    elapsed_seconds is the latency of the last attempt and details is None unless the page
+    came back 200; status_code is None if every attempt failed at the transport level.
+    Throttled and 5xx responses, timeouts and dropped connections are retried with backoff;
+    every throttled or failed attempt is counted so the concurrency controller sees
+    throttling that retries absorbed. Parsing runs in a worker thread so it does not
+    block the event loop."""
+    throttled_attempts = 0
+    for attempt in range(DETAIL_RETRIES + 1):
+        start = time.monotonic()
+        try:
+            response = await client.get(film_url)
+        except httpx.TransportError as e:
+            # Timeouts and dropped connections (e.g. an HTTP/2 GOAWAY) signal overload too
+            throttled_attempts += 1
+            if attempt == DETAIL_RETRIES:
+                print(f"Error scraping {film_url}: {e!r}")
+                return None, None, None, attempt + 1, throttled_attempts
+            await asyncio.sleep(retry_delay(None, attempt))
+            continue
+        elapsed = time.monotonic() - start
+        if response.status_code in THROTTLE_STATUSES:
+            throttled_attempts += 1
+        if response.status_code not in RETRY_STATUSES or attempt == DETAIL_RETRIES:
+            break
+        await asyncio.sleep(retry_delay(response, attempt))
+    attempts = attempt + 1
+    if response.status_code != 200:
+        return response.status_code, elapsed, None, attempts, throttled_attempts
+    details = await asyncio.to_thread(parse_film_details, response.content)
+    return response.status_code, elapsed, details, attempts, throttled_attempts
+
+
+async def scrape_film_details_adaptive(films):
+    """Scrape film pages with a concurrency limit that adapts to how Letterboxd responds.
+    Yields (order, film_id, film_url, details) as pages finish; details is None on failure.
+    After each batch of completions the limit is halved if more than THROTTLE_RATE_LIMIT
+    of the batch's HTTP attempts (retries included) were throttled (429/503) or errored,
+    and raised by 2 after STEADY_BATCHES_TO_GROW clean batches whose median latency
+    stayed steady."""
+    queue = deque((i + 1, film_id, film_url) for i, (film_id, film_url) in enumerate(films))
+    concurrency = DETAIL_WORKERS_START
+    in_flight = {}  # task -> ((order, film_id, film_url), generation)
+    batch = []  # (attempts, throttled_attempts, elapsed) for films submitted since the last adjustment
+    generation = 0  # bumped when concurrency changes so requests sent at the old level are not counted
+    steady_batches = 0
+    best_latency = None
+
+    limits = httpx.Limits(max_connections=DETAIL_WORKERS_MAX, max_keepalive_connections=16)
+    async with httpx.AsyncClient(http2=True, limits=limits, headers=HEADERS,
+                                 timeout=REQUEST_TIMEOUT) as client:
+        try:
+            while queue or in_flight:
+                while queue and len(in_flight) < concurrency:
+                    film = queue.popleft()
+                    task = asyncio.create_task(fetch_film_details(client, film[2]))
+                    in_flight[task] = (film, generation)
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    (order, film_id, film_url), submitted_in = in_flight.pop(task)
+                    try:
+                        status_code, elapsed, details, attempts, throttled_attempts = task.result()
+                    except Exception as e:
+                        print(f"Error scraping {film_url}: {e}")
+                        status_code, elapsed, details, attempts, throttled_attempts = None, None, None, 1, 1
+                    if status_code is not None and status_code != 200:
+                        print(f"Failed to fetch {film_url}: {status_code}")
+                    if submitted_in == generation:
+                        batch.append((attempts, throttled_attempts, elapsed))
+                    yield order, film_id, film_url, details
+
+                if len(batch) < concurrency:
+                    continue
+
+                # Adjust concurrency based on the batch that just finished
+                previous_concurrency = concurrency
+                throttle_rate = sum(throttled for _, throttled, _ in batch) / sum(attempts for attempts, _, _ in batch)
+                latencies = sorted(elapsed for _, _, elapsed in batch if elapsed is not None)
+                latency = latencies[len(latencies) // 2] if latencies else None
+                if latency is not None:
+                    best_latency = latency if best_latency is None else min(best_latency, latency)
+                if throttle_rate > THROTTLE_RATE_LIMIT:
+                    concurrency = max(1, concurrency // 2)
+                    steady_batches = 0
+                    # Already at 1: nothing changed, so don't repeat the message every batch
+                    if concurrency != previous_concurrency:
+                        print(f"  Throttled on {throttle_rate:.0%} of requests, concurrency -> {concurrency}")
+                elif throttle_rate == 0 and latency is not None and latency <= 1.5 * best_latency:
+                    steady_batches += 1
+                    if steady_batches >= STEADY_BATCHES_TO_GROW and concurrency < DETAIL_WORKERS_MAX:
+                        concurrency = min(DETAIL_WORKERS_MAX, concurrency + 2)
+                        steady_batches = 0
+                else:
+                    steady_batches = 0
+                batch = []
+                if concurrency != previous_concurrency:
+                    generation += 1
+        finally:
+            # Interrupted or closed early: don't leave requests running against a closed client
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+
+async def collect_film_rows(films, snapshot_date, csv_file, scraped_data, pending, saved_ids=frozenset()):
+    """Scrape every film page, adding finished rows to scraped_data and pending.
+    pending is appended to the CSV every CHECKPOINT_ROWS rows and cleared. Films in
+    saved_ids (already in the CSV for this snapshot) are kept out of pending."""
+    with tqdm(total=len(films), desc="Scraping films", unit="film") as progress:
+        async for order, film_id, film_url, details in scrape_film_details_adaptive(films):
+            progress.update(1)
+            if details is None:
+                continue
+            film_title, rating_count, rating_value, genres, runtime, tmdb_type, has_description, poster_url = details
+            row = (
+                order, film_id, film_url, film_title, rating_count, rating_value,
+                ", ".join(genres), runtime, tmdb_type, has_description,
+                poster_url, snapshot_date
+            )
+            scraped_data.append(row)
+            if film_id in saved_ids:
+                continue
+            pending.append(row)
+            # Checkpoint in chunks so a crash loses at most the last chunk
+            if len(pending) >= CHECKPOINT_ROWS:
+                append_to_csv(pending, csv_file)
+                pending.clear()
+
+
+def read_snapshot_film_ids(filename, snapshot_date):
+    """Film IDs already in the CSV for snapshot_date, e.g. from a run that crashed or was
+    interrupted. Snapshots are appended in order, so only the trailing rows are read."""
+    if not os.path.exists(filename):
+        return set()
+    with open(filename, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        tail = b""
+        while True:
+            step = min(CSV_TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            tail = f.read(step) + tail
+            lines = tail.split(b"\n")
+            # Unless we reached the start of the file, the first line may be cut off mid-row
+            complete = lines if pos == 0 else lines[1:]
+            rows = list(csv.reader(line.decode("utf-8") for line in complete if line))
+            # Stop once the block reaches back past this snapshot (or to the header)
+            if pos == 0 or (rows and rows[0][-1] != snapshot_date):
+                break
+    return {row[1] for row in rows if row[-1] == snapshot_date}
+
+
+def append_to_csv(rows, filename):
+    """Append rows to the main CSV file, writing the header first if the file is new.
+    Only the new rows are written; existing history is never re-read or rewritten."""
+    new_file = not os.path.exists(filename)
+    with open(filename, "a", newline="", buffering=CSV_WRITE_BUFFER) as f:
+        writer = csv.writer(f, lineterminator="\n")
+        if new_file:
+            writer.writerow(CSV_COLUMNS)
+        writer.writerows(rows)
+
+
+def deduplicate_csv(filename):
+    """Maintenance pass: rewrite the CSV keeping the first row of each Film ID per snapshot date.
+    Not run by the scraper; use it to clean up after accidental repeat runs on the same day."""
+    df = pd.read_csv(filename)
+    deduped = df.drop_duplicates(subset=['Film ID', 'Snapshot Date'], keep='first')
+    deduped.to_csv(filename, index=False)
+    print(f"{filename}: {len(df)} rows -> {len(deduped)} rows after deduplication")
+
+
+def save_to_parquet(data, dataset_path, csv_filename):
+    """Write the snapshot as its own partition of the Parquet history dataset.
+    If the dataset does not exist yet it is backfilled from the CSV history (which
+    already includes this snapshot), so later runs only ever write one partition.
+    A rerun on the same day replaces that day's partition rather than adding to it."""
+    if os.path.exists(dataset_path):
+        df = pd.DataFrame(data, columns=CSV_COLUMNS)
     else:
-        combined_df = new_df
+        print(f"{dataset_path} not found, backfilling from {csv_filename}")
+        df = pd.read_csv(csv_filename)
+    df = df.drop_duplicates(subset=['Film ID', 'Snapshot Date'], keep='first')
+
+    if df.empty:
+        return
 
-    combined_df.to_csv(filename, index=False)
-    
-    # Report on uniqueness for the latest snapshot
-    if len(new_df) > 0:
-        snapshot_date = new_df['Snapshot Date'].iloc[0]
-        snapshot_df = combined_df[combined_df['Snapshot Date'] == snapshot_date]
-        unique_count = snapshot_df['Film ID'].nunique()
-        print(f"Data saved to {filename}")
-        print(f"Snapshot {snapshot_date}: {len(snapshot_df)} total rows, {unique_count} unique Film IDs")
+    # Fix the column types so every partition shares one schema
+    for col in ["Order", "Film ID"]:
+        df[col] = pd.to_numeric(df[col]).astype("int64")
+    for col in ["Rating Count", "Rating Value", "Runtime"]:
+        df[col] = pd.to_numeric(df[col]).astype("float64")
+    df["Has Description"] = df["Has Description"].astype(bool)
+    for col in ["Film URL", "Film Title", "Genres", "TMDB Type", "Poster URL", "Snapshot Date"]:
+        df[col] = df[col].astype("string").replace("", pd.NA)
 
+    df.to_parquet(dataset_path, engine="pyarrow", compression="zstd",
+                  partition_cols=["Snapshot Date"], index=False,
+                  existing_data_behavior="delete_matching")
+    print(f"Data saved to {dataset_path}")
 
-def main(genre_url, pages=14, num_passes=2):
+
+def main(genre_url, pages=14):
     # Enforce hard limit of 14 pages
     pages = min(pages, MAX_PAGES)
     seattle_time = datetime.now(ZoneInfo("America/Los_Angeles"))
     snapshot_date = seattle_time.date().isoformat()
-    films = scrape_top_films(genre_url, pages, num_passes)
+    # Films are listed in rank order, so the first MAX_FILMS seen are the top films
+    film_data = scrape_ajax_pages_single_pass(genre_url, pages)
+    films = [(film_id, film_url) for film_id, (film_url, _, _) in film_data.items()][:MAX_FILMS]
+    print(f"Identified top {len(films)} films")
 
     if not films:
         print("No films found. Exiting.")
         return
 
+    csv_file = "letterboxd_popular_history.csv"
+    # A rerun after a crash or interrupt must not append the rows it already saved
+    saved_ids = read_snapshot_film_ids(csv_file, snapshot_date)
+    if saved_ids:
+        print(f"{len(saved_ids)} films already saved for {snapshot_date}; they won't be appended again")
     scraped_data = []
+    pending = []  # rows not yet checkpointed to the CSV
     try:
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = {executor.submit(get_film_details, film_url): (i + 1, film_id, film_url)
-                       for i, (film_id, film_url) in enumerate(films)}
-
-            for future in tqdm(futures, desc="Scraping films", unit="film"):
-                order, film_id, film_url = futures[future]
-                try:
-                    details = future.result()
-                    if details is None:
-                        continue
-                    film_title, rating_count, rating_value, genres, runtime, tmdb_type, has_description, poster_url = details
-                    scraped_data.append((
-                        order, film_id, film_url, film_title, rating_count, rating_value,
-                        ", ".join(genres), runtime, tmdb_type, has_description,
-                        poster_url, snapshot_date
-                    ))
-                except Exception as e:
-                    print(f"Error scraping {film_url}: {e}")
-                    continue
-
+        # Films are handled as they finish so a slow page does not hold up the rest
+        asyncio.run(collect_film_rows(films, snapshot_date, csv_file, scraped_data, pending, saved_ids))
     except KeyboardInterrupt:
         print("\nInterrupted. Saving data scraped so far...")
 
-    save_to_csv(scraped_data, "letterboxd_popular_history.csv")
+    append_to_csv(pending, csv_file)
+    appended = sum(1 for row in scraped_data if row[1] not in saved_ids)
+    print(f"Data saved to {csv_file}")
+    print(f"Snapshot {snapshot_date}: {appended} rows appended")
+    save_to_parquet(scraped_data, "letterboxd_popular_history.parquet", csv_file)
 
 
 
 if __name__ == "__main__":
     genre_url = "https://letterboxd.com/films/ajax/popular/this/week/"
-    main(genre_url, pages=MAX_PAGES, num_passes=2)
+    main(genre_url, pages=MAX_PAGES)
@@ -8,39 +8,84 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
 import numpy as np
+import os
 
 # Set style
 sns.set_style("whitegrid")
 plt.rcParams['figure.figsize'] = (14, 8)
 
-def load_and_prepare_data(csv_file='letterboxd_popular_history.csv'):
-    """Load and prepare the dataset for visualization."""
-    df = pd.read_csv(csv_file)
-    
-    # Normalize date format (some dates might be in different formats)
-    def parse_date(date_str):
-        try:
-            # Try ISO format first
-            return pd.to_datetime(date_str, format='%Y-%m-%d')
-        except:
-            try:
-                # Try M/D/YYYY format
-                return pd.to_datetime(date_str, format='%m/%d/%Y')
-            except:
-                return pd.to_datetime(date_str)
-    
-    df['Date'] = df['Snapshot Date'].apply(parse_date)
+# Column types for the history CSV so the loader skips type inference
+CSV_DTYPES = {
+    'Film ID': 'int64[pyarrow]',
+    'Order': 'int32[pyarrow]',
+    'Rating Count': 'float32[pyarrow]',
+    'Rating Value': 'float32[pyarrow]',
+    'Film Title': 'string[pyarrow]',
+    'Genres': 'string[pyarrow]',
+    'TMDB Type': 'string[pyarrow]',
+}
+
+# Columns the visualizations actually use
+PARQUET_COLUMNS = ['Order', 'Film ID', 'Film Title', 'Rating Value', 'Genres', 'Snapshot Date']
+
+def load_and_prepare_data(csv_file='letterboxd_popular_history.csv',
+                          parquet_path='letterboxd_popular_history.parquet'):
+    """Load and prepare the dataset for visualization.
+    Reads the partitioned Parquet history written by the scraper when it exists,
+    otherwise falls back to the CSV."""
+    if os.path.exists(parquet_path):
+        df = pd.read_parquet(parquet_path, engine='pyarrow', columns=PARQUET_COLUMNS,
+                             dtype_backend='pyarrow')
+        # Partition values come back as a dictionary column
+        df['Snapshot Date'] = df['Snapshot Date'].astype('string[pyarrow]')
+    else:
+        df = pd.read_csv(csv_file, engine='pyarrow', dtype_backend='pyarrow', dtype=CSV_DTYPES)
+    
+    # Normalize date format (some dates might be in different formats):
+    # ISO first, then M/D/YYYY, then let pandas infer whatever is left
+    dates = pd.to_datetime(df['Snapshot Date'], format='%Y-%m-%d', errors='coerce')
+    mask = dates.isna()
+    dates[mask] = pd.to_datetime(df.loc[mask, 'Snapshot Date'], format='%m/%d/%Y', errors='coerce')
+    mask = dates.isna()
+    if mask.any():
+        dates[mask] = pd.to_datetime(df.loc[mask, 'Snapshot Date'], format='mixed')
+    df['Date'] = dates
     df = df.sort_values('Date')
     
+    # Split genres once so genre analytics can explode this column instead of re-splitting strings
+    df['GenresList'] = df['Genres'].str.strip().str.split(r'\s*,\s*', regex=True)
+    
     return df
 
-def plot_ranking_trends(df, film_ids=None, top_n=10):
+def get_film_appearances(df):
+    """Number of snapshots each film title appears in, most consistent first."""
+    return df.groupby('Film Title')['Date'].nunique().sort_values(ascending=False)
+
+def get_latest_snapshot(df):
+    """Rows belonging to the most recent snapshot."""
+    return df[df['Date'] == df['Date'].max()]
+
+def get_recent_consistent_films(df, last_k=7):
+    """Films present in every one of the last K snapshots, best average rank first.
+    Replaces the scraper's old multi-pass scoring with the same signal taken from history."""
+    recent_dates = sorted(df['Date'].unique())[-last_k:]
+    recent = df[df['Date'].isin(recent_dates)]
+    stats = recent.groupby('Film ID').agg(**{
+        'Film Title': ('Film Title', 'first'),
+        'Appearances': ('Date', 'nunique'),
+        'Best Rank': ('Order', 'min'),
+        'Avg Rank': ('Order', 'mean'),
+    })
+    return stats[stats['Appearances'] == len(recent_dates)].sort_values(['Avg Rank', 'Best Rank'])
+
+def plot_ranking_trends(df, film_ids=None, top_n=10, film_appearances=None):
     """Plot ranking trends over time for specific films or top N most consistent films."""
     fig, ax = plt.subplots(figsize=(16, 10))
     
     if film_ids is None:
         # Find films that appear in most snapshots (most consistent)
-        film_appearances = df.groupby('Film Title')['Date'].nunique().sort_values(ascending=False)
+        if film_appearances is None:
+            film_appearances = get_film_appearances(df)
         top_films = film_appearances.head(top_n).index.tolist()
         print(f"\nPlotting top {top_n} most consistent films:")
         for i, film in enumerate(top_films, 1):
@@ -69,26 +114,14 @@ def plot_ranking_trends(df, film_ids=None, top_n=10):
 
 def plot_film_entries_exits(df):
     """Plot how many new films enter and exit the top 1000 each week."""
-    # Get unique dates
-    dates = sorted(df['Date'].unique())
-    
-    entries = []
-    exits = []
-    
-    for i, date in enumerate(dates):
-        current_films = set(df[df['Date'] == date]['Film ID'].unique())
-        
-        if i > 0:
-            prev_films = set(df[df['Date'] == dates[i-1]]['Film ID'].unique())
-            # New entries
-            new_entries = len(current_films - prev_films)
-            # Films that exited
-            new_exits = len(prev_films - current_films)
-            entries.append(new_entries)
-            exits.append(new_exits)
-        else:
-            entries.append(0)
-            exits.append(0)
+    # Film x date presence matrix; diffing along dates marks entries (+1) and exits (-1)
+    presence = (df.assign(Present=1)
+                .pivot_table(index='Film ID', columns='Date', values='Present', aggfunc='max', fill_value=0)
+                .astype('int8'))
+    changes = presence.diff(axis=1)
+    entries = (changes == 1).sum(axis=0).tolist()
+    exits = (changes == -1).sum(axis=0).tolist()
+    dates = presence.columns
     
     fig, ax = plt.subplots(figsize=(14, 6))
     x = dates
@@ -110,35 +143,24 @@ def plot_film_entries_exits(df):
 
 def plot_genre_distribution(df):
     """Plot genre distribution over time."""
-    # Expand genres (some films have multiple genres)
-    genre_data = []
-    for _, row in df.iterrows():
-        if pd.notna(row['Genres']):
-            genres = [g.strip() for g in str(row['Genres']).split(',')]
-            for genre in genres:
-                genre_data.append({
-                    'Date': row['Date'],
-                    'Genre': genre,
-                    'Film ID': row['Film ID']
-                })
-    
-    genre_df = pd.DataFrame(genre_data)
+    # Expand genres (some films have multiple genres) into one row per film-genre pair
+    genre_df = (df[['Date', 'Film ID', 'GenresList']]
+                .explode('GenresList')
+                .rename(columns={'GenresList': 'Genre'})
+                .dropna(subset=['Genre']))
+    genre_df['Genre'] = genre_df['Genre'].astype('category')
     
     # Get top 10 genres by total appearances
-    top_genres = genre_df.groupby('Genre')['Film ID'].nunique().sort_values(ascending=False).head(10).index.tolist()
+    top_genres = genre_df.groupby('Genre', observed=True)['Film ID'].nunique().sort_values(ascending=False).head(10).index.tolist()
     
     # Calculate percentage of top 1000 for each genre over time
-    dates = sorted(df['Date'].unique())
-    genre_percentages = {genre: [] for genre in top_genres}
-    
-    for date in dates:
-        date_films = set(df[df['Date'] == date]['Film ID'].unique())
-        total_films = len(date_films)
-        
-        for genre in top_genres:
-            genre_films = set(genre_df[(genre_df['Date'] == date) & (genre_df['Genre'] == genre)]['Film ID'].unique())
-            percentage = (len(genre_films) / total_films * 100) if total_films > 0 else 0
-            genre_percentages[genre].append(percentage)
+    total_films = df.groupby('Date')['Film ID'].nunique()
+    genre_counts = (genre_df[genre_df['Genre'].isin(top_genres)]
+                    .groupby(['Date', 'Genre'], observed=True)['Film ID'].nunique()
+                    .unstack(fill_value=0)
+                    .reindex(index=total_films.index, columns=top_genres, fill_value=0))
+    genre_percentages = genre_counts.div(total_films, axis=0) * 100
+    dates = total_films.index
     
     fig, ax = plt.subplots(figsize=(14, 8))
     for genre in top_genres:
@@ -154,13 +176,15 @@ def plot_genre_distribution(df):
     print("Saved: genre_distribution.png")
     plt.close()
 
-def plot_rating_vs_ranking(df):
+def plot_rating_vs_ranking(df, latest_df=None):
     """Plot relationship between rating and ranking position."""
     fig, axes = plt.subplots(1, 2, figsize=(16, 6))
     
     # Scatter plot: Rating Value vs Ranking
-    latest_date = df['Date'].max()
-    latest_df = df[df['Date'] == latest_date].copy()
+    if latest_df is None:
+        latest_df = get_latest_snapshot(df)
+    latest_df = latest_df.copy()
+    latest_date = latest_df['Date'].max()
     
     axes[0].scatter(latest_df['Rating Value'], latest_df['Order'], alpha=0.5, s=50)
     axes[0].set_xlabel('Average Rating', fontsize=12)
@@ -184,27 +208,19 @@ def plot_rating_vs_ranking(df):
     print("Saved: rating_vs_ranking.png")
     plt.close()
 
-def plot_most_consistent_films(df, top_n=20):
+def plot_most_consistent_films(df, top_n=20, film_appearances=None):
     """Create a heatmap showing the most consistent films and their rankings over time."""
     # Find films that appear in most snapshots
-    film_appearances = df.groupby('Film Title')['Date'].nunique().sort_values(ascending=False)
+    if film_appearances is None:
+        film_appearances = get_film_appearances(df)
     top_films = film_appearances.head(top_n).index.tolist()
     
-    # Create matrix: films x dates
+    # Create matrix: films x dates (NaN where a film was not in the top 1000 on that date)
     dates = sorted(df['Date'].unique())
-    heatmap_data = []
-    
-    for film_title in top_films:
-        film_row = []
-        for date in dates:
-            film_data = df[(df['Film Title'] == film_title) & (df['Date'] == date)]
-            if len(film_data) > 0:
-                film_row.append(film_data['Order'].iloc[0])
-            else:
-                film_row.append(np.nan)  # Film not in top 1000 on this date
-        heatmap_data.append(film_row)
-    
-    heatmap_df = pd.DataFrame(heatmap_data, index=top_films, columns=dates)
+    subset = df[df['Film Title'].isin(top_films)]
+    heatmap_df = (subset.pivot_table(index='Film Title', columns='Date', values='Order', aggfunc='first')
+                  .reindex(index=top_films, columns=dates)
+                  .astype('float64'))
     
     fig, ax = plt.subplots(figsize=(16, 10))
     sns.heatmap(heatmap_df, cmap='RdYlGn_r', annot=False, fmt='.0f', 
@@ -236,7 +252,7 @@ def plot_most_consistent_films(df, top_n=20):
     print("Saved: most_consistent_films_heatmap.png")
     plt.close()
 
-def generate_summary_stats(df):
+def generate_summary_stats(df, film_appearances=None, latest_df=None):
     """Print summary statistics about the dataset."""
     print("\n" + "="*60)
     print("DATASET SUMMARY")
@@ -248,7 +264,8 @@ def generate_summary_stats(df):
     
     # Most consistent films
     print(f"\nTop 10 Most Consistent Films (by appearances):")
-    film_appearances = df.groupby('Film Title')['Date'].nunique().sort_values(ascending=False)
+    if film_appearances is None:
+        film_appearances = get_film_appearances(df)
     for i, (film, count) in enumerate(film_appearances.head(10).items(), 1):
         print(f"  {i}. {film}: {count} appearances")
     
@@ -256,12 +273,18 @@ def generate_summary_stats(df):
     print(f"\nTop 10 Films by Best Average Ranking:")
     avg_rankings = df.groupby('Film Title')['Order'].mean().sort_values()
     for i, (film, avg_rank) in enumerate(avg_rankings.head(10).items(), 1):
-        appearances = df[df['Film Title'] == film]['Date'].nunique()
-        print(f"  {i}. {film}: Avg Rank {avg_rank:.1f} ({appearances} appearances)")
+        print(f"  {i}. {film}: Avg Rank {avg_rank:.1f} ({film_appearances[film]} appearances)")
+    
+    # Films holding their place across recent snapshots
+    recent_consistent = get_recent_consistent_films(df, last_k=7)
+    print(f"\nFilms in All of the Last 7 Snapshots: {len(recent_consistent)}")
+    for i, (_, row) in enumerate(recent_consistent.head(10).iterrows(), 1):
+        print(f"  {i}. {row['Film Title']}: Avg Rank {row['Avg Rank']:.1f} (best {row['Best Rank']})")
     
     # Latest snapshot stats
-    latest_date = df['Date'].max()
-    latest_df = df[df['Date'] == latest_date]
+    if latest_df is None:
+        latest_df = get_latest_snapshot(df)
+    latest_date = latest_df['Date'].max()
     print(f"\nLatest Snapshot ({latest_date.date()}):")
     print(f"  Films in top 1000: {latest_df['Film ID'].nunique()}")
     print(f"  Top 5 films: {', '.join(latest_df.nsmallest(5, 'Order')['Film Title'].tolist())}")
@@ -271,15 +294,19 @@ def main():
     print("Loading data...")
     df = load_and_prepare_data()
     
+    # Shared by several of the plots below
+    film_appearances = get_film_appearances(df)
+    latest_df = get_latest_snapshot(df)
+    
     print("Generating summary statistics...")
-    generate_summary_stats(df)
+    generate_summary_stats(df, film_appearances=film_appearances, latest_df=latest_df)
     
     print("\n" + "="*60)
     print("GENERATING VISUALIZATIONS")
     print("="*60)
     
     print("\n1. Creating ranking trends plot...")
-    plot_ranking_trends(df, top_n=10)
+    plot_ranking_trends(df, top_n=10, film_appearances=film_appearances)
     
     print("\n2. Creating entries/exits plot...")
     plot_film_entries_exits(df)
@@ -288,10 +315,10 @@ def main():
     plot_genre_distribution(df)
     
     print("\n4. Creating rating vs ranking plot...")
-    plot_rating_vs_ranking(df)
+    plot_rating_vs_ranking(df, latest_df=latest_df)
     
     print("\n5. Creating most consistent films heatmap...")
-    plot_most_consistent_films(df, top_n=20)
+    plot_most_consistent_films(df, top_n=20, film_appearances=film_appearances)
     
     print("\n" + "="*60)
     print("All visualizations complete!")